@@ -1,36 +1,71 @@
 import argparse
+import hashlib
 import os
 import shutil
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby
+from glob import glob
+from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema.document import Document
-from get_embedding_function import get_embedding_function
 from langchain_community.vectorstores import Chroma
-
-# Default paths for data and vector database
+try:
+    # Optional Rust-backed splitter with the same recursive split cascade
+    from semantic_text_splitter import TextSplitter
+except ImportError:
+    TextSplitter = None
+from db_client import CHROMA_PATH, get_db
+from get_embedding_function import EMBEDDING_BATCH_SIZE, OLLAMA_CONCURRENCY
+from fast_search import build_dense_index, clear_dense_index, dense_index_available
+from usearch_index import build_usearch_index, clear_usearch_index, usearch_enabled, usearch_index_available
+
+# Default path for data
 DATA_PATH = 'books'
-CHROMA_PATH = 'chroma'
+
+# Chunks shorter than this are merged into a neighbouring chunk from the same page
+MIN_CHUNK_SIZE = 100
+
+# How far a merged chunk may exceed chunk_size
+MERGE_SLACK = 150
+
+# Number of chunks buffered in memory before they are written to Chroma;
+# large enough to give every concurrent embedding request a full batch
+INGEST_BUFFER_SIZE = max(256, EMBEDDING_BATCH_SIZE * OLLAMA_CONCURRENCY)
 
 def main():
     """
     Main entry point for ingesting documents into the Chroma vector database.
 
     - Optionally resets the database using --reset flag.
-    - Loads documents from PDF files in a directory.
-    - Splits documents into smaller chunks.
-    - Adds chunks to the Chroma database if they don't already exist.
+    - Streams pages from PDF files in a directory.
+    - Splits each page into smaller chunks.
+    - Adds chunks to the Chroma database in fixed-size buffers if they don't already exist.
+    - Rebuilds the dense matrix used for brute-force search on small corpora, if it is missing.
+    - Rebuilds the usearch index if RAG_VECTOR_BACKEND=usearch and it is missing.
     """
     parser = argparse.ArgumentParser(description="Load and embed documents into a Chroma vector database.")
     parser.add_argument("--reset", action="store_true", help="Reset the vector database before ingesting.")
     args = parser.parse_args()
 
+    remove_stale_trash()
+
     if args.reset:
         print("Clearing Database")
         clear_database()
 
-    documents = load_documents_from_directory()
-    chunks = split_documents(documents)
-    add_to_chroma(chunks)
+    documents = iter_documents_from_directory()
+    ingest_documents(documents)
+
+    # add_to_chroma drops the derived indexes whenever it writes, so only missing ones need rebuilding
+    db = get_db()
+    if not dense_index_available():
+        build_dense_index(db)
+    if usearch_enabled() and not usearch_index_available():
+        build_usearch_index(db)
 
 def load_documents_from_directory(directory_path: str = DATA_PATH) -> list[Document]:
     """
@@ -44,7 +79,26 @@ def load_documents_from_directory(directory_path: str = DATA_PATH) -> list[Docum
 
     Raises:
         FileNotFoundError: If the directory does not exist.
-        ValueError: If the directory is empty.
+        ValueError: If the directory is empty or contains no PDF files.
+    """
+    return list(iter_documents_from_directory(directory_path))
+
+def iter_documents_from_directory(directory_path: str = DATA_PATH) -> Iterator[Document]:
+    """
+    Returns a lazy iterator over the pages of all PDF documents in the specified directory.
+
+    Several PDFs are parsed in worker processes, one window of up to os.cpu_count() files
+    at a time, so only the pages of the files in the current window are held in memory.
+
+    Args:
+        directory_path (str): Directory containing PDF files.
+
+    Returns:
+        Iterator[Document]: One LangChain Document per PDF page.
+
+    Raises:
+        FileNotFoundError: If the directory does not exist.
+        ValueError: If the directory is empty or contains no PDF files.
     """
     if not os.path.exists(directory_path):
         raise FileNotFoundError(f"Directory {directory_path} does not exist")
@@ -52,14 +106,42 @@ def load_documents_from_directory(directory_path: str = DATA_PATH) -> list[Docum
     if not os.listdir(directory_path):
         raise ValueError(f"Directory {directory_path} is empty")
 
-    loader = PyPDFDirectoryLoader(directory_path)
-    documents = loader.load()
-    return documents
+    # Same file set as PyPDFDirectoryLoader: PDFs in the directory and its subdirectories, hidden files excluded
+    paths = sorted(glob(os.path.join(directory_path, "**", "*.pdf"), recursive=True))
+    if not paths:
+        raise ValueError(f"Directory {directory_path} contains no PDF files")
+
+    return _iter_pdf_pages(paths)
+
+def _iter_pdf_pages(paths: list[str]) -> Iterator[Document]:
+    """
+    Yields the pages of the given PDF files, parsing one window of files in parallel at a time.
+    """
+    # A single book is parsed in-process; spawning workers would only re-import this module
+    if len(paths) == 1:
+        yield from _load_pdf(paths[0])
+        return
+
+    workers = min(os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for window in chunked(paths, workers):
+            for documents in executor.map(_load_pdf, window):
+                yield from documents
+
+def _load_pdf(path: str) -> list[Document]:
+    """
+    Loads all pages of a single PDF file (runs in a worker process).
+    """
+    return PyPDFLoader(path).load()
 
 def split_documents(documents: list[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> list[Document]:
     """
     Splits documents into smaller chunks for better embedding and retrieval.
 
+    Uses the native `semantic-text-splitter` package when it is installed and
+    falls back to LangChain's RecursiveCharacterTextSplitter otherwise. Tiny chunks
+    (e.g. a lone heading) are then merged into their neighbours, see merge_small_chunks.
+
     Args:
         documents (list[Document]): List of input documents.
         chunk_size (int): Maximum number of characters in each chunk.
@@ -74,47 +156,175 @@ def split_documents(documents: list[Document], chunk_size: int = 1000, chunk_ove
     if not documents:
         raise ValueError("No documents to split")
 
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = _get_text_splitter(chunk_size, chunk_overlap)
+
+    if TextSplitter is not None:
+        chunks = [
+            Document(page_content=piece, metadata=dict(document.metadata))
+            for document in documents
+            for piece in text_splitter.chunks(document.page_content)
+        ]
+    else:
+        chunks = text_splitter.split_documents(documents)
+
+    return merge_small_chunks(chunks, MIN_CHUNK_SIZE, chunk_size + MERGE_SLACK)
+
+def merge_small_chunks(chunks: list[Document], min_chunk_size: int, max_chunk_size: int) -> list[Document]:
+    """
+    Merges chunks shorter than min_chunk_size into an adjacent chunk from the same page.
+
+    A small chunk is merged into the following chunk, or into the preceding one if it
+    is the last chunk of its page, as long as the result stays within max_chunk_size.
+    Text already repeated in the neighbour through the splitter's overlap is not
+    duplicated. Merged chunks keep the metadata of their first chunk.
+
+    Args:
+        chunks (list[Document]): Chunks in splitter order.
+        min_chunk_size (int): Chunks shorter than this are merged.
+        max_chunk_size (int): Maximum number of characters in a merged chunk.
+
+    Returns:
+        list[Document]: Compacted chunks.
+    """
+    def page_key(chunk: Document):
+        return chunk.metadata.get("source"), chunk.metadata.get("page")
+
+    merged = []
+    for _page, page_chunks in groupby(chunks, key=page_key):
+        page_merged = []
+        for chunk in page_chunks:
+            previous = page_merged[-1] if page_merged else None
+            if previous is not None and len(previous.page_content) < min_chunk_size:
+                combined = _join_chunk_texts(previous.page_content, chunk.page_content)
+                if len(combined) <= max_chunk_size:
+                    page_merged[-1] = Document(page_content=combined, metadata=previous.metadata)
+                    continue
+            page_merged.append(chunk)
+
+        # A small trailing chunk has no successor, so merge it backwards
+        if len(page_merged) > 1 and len(page_merged[-1].page_content) < min_chunk_size:
+            previous, last = page_merged[-2], page_merged[-1]
+            combined = _join_chunk_texts(previous.page_content, last.page_content)
+            if len(combined) <= max_chunk_size:
+                page_merged[-2:] = [Document(page_content=combined, metadata=previous.metadata)]
+
+        merged.extend(page_merged)
+
+    return merged
+
+def _join_chunk_texts(first: str, second: str) -> str:
+    """
+    Concatenates two adjacent chunk texts, dropping one that the overlap already contains.
+    """
+    if second.startswith(first):
+        return second
+    if first.endswith(second):
+        return first
+    return f"{first}\n{second}"
+
+@lru_cache(maxsize=8)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int):
+    """
+    Builds the text splitter for the given settings once and reuses it across calls.
+    """
+    if TextSplitter is not None:
+        return TextSplitter(chunk_size, overlap=chunk_overlap)
+
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len
     )
 
-    return text_splitter.split_documents(documents)
+def ingest_documents(documents: Iterable[Document], db: Chroma | None = None):
+    """
+    Splits a stream of documents and adds the resulting chunks to Chroma in buffers.
 
-def add_to_chroma(chunks: list[Document]):
+    Args:
+        documents (Iterable[Document]): Documents (typically PDF pages) to ingest.
+        db (Chroma | None): Already-open vector store; defaults to the shared client.
+    """
+    buffer = []
+    for document in documents:
+        buffer.extend(split_documents([document]))
+        if len(buffer) >= INGEST_BUFFER_SIZE:
+            add_to_chroma(buffer, db)
+            buffer = []
+
+    if buffer:
+        add_to_chroma(buffer, db)
+
+def add_to_chroma(chunks: list[Document], db: Chroma | None = None):
     """
     Adds new chunks to the Chroma vector database if they are not already present.
 
     Args:
         chunks (list[Document]): List of document chunks to add.
+        db (Chroma | None): Already-open vector store; defaults to the shared client.
     """
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=get_embedding_function())
+    if db is None:
+        db = get_db()
+    embedding_function = db.embeddings
 
     chunks_with_ids = calculate_chunk_ids(chunks)
 
-    # Retrieve existing document IDs from the database
-    existing_items = db.get(include=[])  # Only returns document IDs
+    # Look up only the candidate IDs, so the transfer scales with the chunks rather than the DB
+    # Identical chunks on a page share an ID, and Chroma rejects duplicate IDs in a lookup
+    candidate_ids = list(dict.fromkeys(chunk.metadata["id"] for chunk in chunks_with_ids))
+    existing_items = db._collection.get(ids=candidate_ids, include=[])  # Only returns document IDs
     existing_ids = set(existing_items["ids"])
 
-    print(f"Number of existing documents in DB: {len(existing_ids)}")
+    print(f"Number of chunks already in DB: {len(existing_ids)}")
 
-    # Filter out chunks that already exist in the DB
-    new_chunks = [chunk for chunk in chunks_with_ids if chunk.metadata["id"] not in existing_ids]
+    # Filter out chunks that already exist in the DB, and repeated chunks within this batch
+    new_chunks = []
+    for chunk in chunks_with_ids:
+        if chunk.metadata["id"] not in existing_ids:
+            new_chunks.append(chunk)
+            existing_ids.add(chunk.metadata["id"])
 
     if new_chunks:
         print(f"Adding new documents: {len(new_chunks)}")
-        new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-        db.add_documents(new_chunks, ids=new_chunk_ids)
+        # Embed in batches so each Ollama request covers many chunks, with one batch per concurrent request
+        for batch in chunked(new_chunks, EMBEDDING_BATCH_SIZE * OLLAMA_CONCURRENCY):
+            texts = [chunk.page_content for chunk in batch]
+            db._collection.add(
+                ids=[chunk.metadata["id"] for chunk in batch],
+                embeddings=embedding_function.embed_documents(texts),
+                documents=texts,
+                metadatas=[chunk.metadata for chunk in batch],
+            )
         db.persist()
+
+        # The derived indexes no longer cover every chunk; drop them until they are rebuilt.
+        # Queries then fall back to Chroma (dense) or fail loudly (usearch) instead of missing chunks.
+        clear_dense_index()
+        clear_usearch_index()
     else:
         print("No new documents to add")
 
+def chunked(items: list, size: int):
+    """
+    Yields consecutive slices of a list with at most `size` elements each.
+
+    Args:
+        items (list): List to slice.
+        size (int): Maximum number of elements per slice.
+
+    Yields:
+        list: Consecutive slices of `items`.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 def calculate_chunk_ids(chunks: list[Document]) -> list[Document]:
     """
-    Generates unique IDs for each chunk based on its source, page number, and index.
+    Generates content-addressed IDs for each chunk based on its source, page number, and text.
 
-    Example ID format: 'books/document.pdf:6:2'
+    The last component is the first 16 hex digits of the SHA-1 of the chunk text,
+    so unchanged chunks keep their IDs even if neighbouring chunks on the page change.
+
+    Example ID format: 'books/document.pdf:6:3f2a9c0d1e4b5a67'
 
     Args:
         chunks (list[Document]): List of chunks to assign IDs.
@@ -122,31 +332,50 @@ def calculate_chunk_ids(chunks: list[Document]) -> list[Document]:
     Returns:
         list[Document]: Chunks with metadata["id"] field populated.
     """
-    last_page_id = None
-    current_chunk_index = 0
-
     for chunk in chunks:
         source = chunk.metadata.get("source")
         page = chunk.metadata.get("page")
-        current_page_id = f"{source}:{page}"
-
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
-
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        chunk.metadata["id"] = chunk_id
-        last_page_id = current_page_id
+        content_hash = hashlib.sha1(chunk.page_content.encode()).hexdigest()[:16]
+        chunk.metadata["id"] = f"{source}:{page}:{content_hash}"
 
     return chunks
 
 def clear_database():
     """
-    Deletes the Chroma vector database directory.
+    Deletes the Chroma vector database directory and the dense and usearch indexes built from it.
+
+    The Chroma directory is first renamed to a trash path, which is atomic, and then
+    deleted in a background thread. An interrupted deletion leaves only a trash
+    directory behind, which remove_stale_trash() cleans up on the next run.
     """
+    # Drop the shared client so the next get_db() opens a fresh store
+    get_db.cache_clear()
+
     if os.path.exists(CHROMA_PATH):
-        shutil.rmtree(CHROMA_PATH)
+        trash_path = f"{CHROMA_PATH}.trash.{os.getpid()}.{time.time_ns()}"
+        os.rename(CHROMA_PATH, trash_path)
+        _delete_in_background([trash_path])
+
+    clear_dense_index()
+    clear_usearch_index()
+
+def remove_stale_trash():
+    """
+    Deletes Chroma trash directories left behind by interrupted resets, in a background thread.
+    """
+    trash_paths = glob(f"{CHROMA_PATH}.trash.*")
+    if trash_paths:
+        _delete_in_background(trash_paths)
+
+def _delete_in_background(paths: list[str]):
+    """
+    Recursively deletes the given directories in a daemon thread.
+    """
+    def delete_all():
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    threading.Thread(target=delete_all, daemon=True).start()
 
 if __name__ == "__main__":
     main()
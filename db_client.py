@@ -0,0 +1,45 @@
+from collections.abc import Iterator
+from functools import lru_cache
+from langchain_community.vectorstores import Chroma
+from get_embedding_function import get_embedding_function
+
+# Path to the persistent vector store
+CHROMA_PATH = "chroma"
+
+# Number of records read from Chroma per page when exporting the whole collection
+EXPORT_PAGE_SIZE = 10_000
+
+@lru_cache(maxsize=1)
+def get_db() -> Chroma:
+    """
+    Returns the process-wide Chroma client, opening it on first use.
+
+    The client and its embedding function are created once and reused by every
+    subsequent call, so repeated ingests or queries in the same process do not
+    reload the persisted index.
+
+    Returns:
+        Chroma: Vector store backed by CHROMA_PATH.
+    """
+    return Chroma(persist_directory=CHROMA_PATH, embedding_function=get_embedding_function())
+
+def iter_collection_pages(db: Chroma, include: list[str], page_size: int = EXPORT_PAGE_SIZE) -> Iterator[tuple[int, dict]]:
+    """
+    Reads the whole Chroma collection page by page.
+
+    Args:
+        db (Chroma): Vector store to read from.
+        include (list[str]): Fields to fetch for each record (e.g. "embeddings", "documents").
+        page_size (int): Maximum number of records per page.
+
+    Yields:
+        tuple[int, dict]: Offset of the first record in the page, and the page as returned by Collection.get.
+    """
+    offset = 0
+    while True:
+        page = db._collection.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+
+        yield offset, page
+        offset += len(page["ids"])
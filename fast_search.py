@@ -0,0 +1,118 @@
+import os
+import shutil
+from functools import lru_cache
+import numpy as np
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+from db_client import iter_collection_pages
+
+# Directory holding the dense embedding matrix and its chunk IDs
+DENSE_PATH = "dense"
+DENSE_EMBEDDINGS_FILE = os.path.join(DENSE_PATH, "embeddings.npy")
+DENSE_IDS_FILE = os.path.join(DENSE_PATH, "ids.npy")
+
+# Largest corpus for which a brute-force scan is used instead of Chroma's HNSW index
+DENSE_SEARCH_MAX_CHUNKS = 100_000
+
+def build_dense_index(db: Chroma):
+    """
+    Exports all embeddings from Chroma into a normalized dense matrix on disk.
+
+    The matrix is only built for corpora of at most DENSE_SEARCH_MAX_CHUNKS chunks;
+    for larger ones any previous matrix is removed and queries fall back to Chroma.
+
+    Args:
+        db (Chroma): Vector store to export embeddings from.
+    """
+    clear_dense_index()
+
+    count = db._collection.count()
+    if count == 0 or count > DENSE_SEARCH_MAX_CHUNKS:
+        return
+
+    os.makedirs(DENSE_PATH)
+    matrix = None
+    ids = []
+
+    for offset, page in iter_collection_pages(db, include=["embeddings"]):
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                DENSE_EMBEDDINGS_FILE, mode="w+", dtype=np.float32, shape=(count, vectors.shape[1])
+            )
+
+        matrix[offset:offset + len(vectors)] = vectors
+        ids.extend(page["ids"])
+
+    matrix.flush()
+    del matrix
+    np.save(DENSE_IDS_FILE, np.asarray(ids))
+
+    print(f"Built dense index with {len(ids)} chunks")
+
+def dense_index_available() -> bool:
+    """
+    Returns True if a dense matrix has been built for the current corpus.
+    """
+    return os.path.exists(DENSE_EMBEDDINGS_FILE) and os.path.exists(DENSE_IDS_FILE)
+
+def search_dense(db: Chroma, query_embedding: list[float], k: int = 5) -> list[tuple[Document, float]]:
+    """
+    Finds the chunks closest to a query embedding with a brute-force cosine scan.
+
+    Args:
+        db (Chroma): Vector store holding the chunk texts and metadata.
+        query_embedding (list[float]): Embedded query.
+        k (int): Number of results to return.
+
+    Returns:
+        list[tuple[Document, float]]: Matching chunks with cosine similarity scores, best first.
+    """
+    matrix, ids = _load_dense_index()
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    scores = matrix @ (query / np.linalg.norm(query))
+    best = top_k(scores, k)
+
+    best_ids = [str(ids[i]) for i in best]
+    records = db._collection.get(ids=best_ids, include=["documents", "metadatas"])
+    by_id = {
+        chunk_id: Document(page_content=document, metadata=metadata)
+        for chunk_id, document, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+    }
+    return [(by_id[chunk_id], float(scores[i])) for chunk_id, i in zip(best_ids, best) if chunk_id in by_id]
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the indices of the k highest scores, highest first.
+
+    Args:
+        scores (np.ndarray): One score per row.
+        k (int): Number of indices to return.
+
+    Returns:
+        np.ndarray: Indices of the best scores in descending order.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+@lru_cache(maxsize=1)
+def _load_dense_index():
+    """
+    Memory-maps the dense matrix and loads its chunk IDs (once per process).
+    """
+    return np.load(DENSE_EMBEDDINGS_FILE, mmap_mode="r"), np.load(DENSE_IDS_FILE)
+
+def clear_dense_index():
+    """
+    Deletes the dense matrix directory.
+    """
+    _load_dense_index.cache_clear()
+
+    if os.path.exists(DENSE_PATH):
+        shutil.rmtree(DENSE_PATH)
@@ -1,15 +1,316 @@
-from langchain_community.embeddings.ollama import OllamaEmbeddings
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+
+# Default Ollama server and embedding model
+OLLAMA_BASE_URL = "http://localhost:11434"
+EMBEDDING_MODEL = "nomic-embed-text"
+
+# Instructions prepended to documents and queries before embedding (as in LangChain's OllamaEmbeddings)
+EMBED_INSTRUCTION = "passage: "
+QUERY_INSTRUCTION = "query: "
+
+# How long Ollama keeps a model loaded after the last request
+OLLAMA_KEEP_ALIVE = "10m"
+
+# Number of texts sent to Ollama per embedding request
+EMBEDDING_BATCH_SIZE = 64
+
+def _read_concurrency(default: int = 1) -> int:
+    """
+    Reads OLLAMA_CONCURRENCY from the environment, falling back to `default` on a missing or invalid value.
+    """
+    value = os.environ.get("OLLAMA_CONCURRENCY", "")
+    try:
+        return max(1, int(value))
+    except ValueError:
+        if value:
+            print(f"Ignoring invalid OLLAMA_CONCURRENCY={value!r}, using {default}")
+        return default
+
+# Number of embedding requests in flight at once; raise it for multi-worker Ollama hosts
+OLLAMA_CONCURRENCY = _read_concurrency()
+
+# Seconds to wait for Ollama to answer one embedding request
+OLLAMA_REQUEST_TIMEOUT = 300
+
+# Retries (with exponential backoff) for requests rejected by a busy Ollama server
+_MAX_RETRIES = 5
+_RETRY_STATUS_CODES = {429, 503}
+
+# Path to the persistent embedding cache (kept outside the Chroma directory so it survives --reset)
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite3"
+
+# Storage type of cached vectors; half precision halves the cache size at negligible cosine error
+EMBEDDING_CACHE_DTYPE = np.float16
+
+# Number of query embeddings memoized in process memory
+QUERY_CACHE_SIZE = 1024
+
+# Maximum number of keys per SELECT, below SQLite's bound-parameter limit
+_CACHE_LOOKUP_BATCH = 500
+
+class OllamaBatchEmbeddings(Embeddings):
+    """
+    Thin embedding wrapper around Ollama's native batch endpoint (/api/embed).
+
+    Unlike OllamaEmbeddings, which sends one HTTP request per text, this class
+    embeds up to `batch_size` texts per request and keeps up to `concurrency`
+    requests in flight at once. Like OllamaEmbeddings, it prepends `embed_instruction`
+    to documents and `query_instruction` to queries.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        base_url: str = OLLAMA_BASE_URL,
+        keep_alive: str = OLLAMA_KEEP_ALIVE,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        concurrency: int = OLLAMA_CONCURRENCY,
+        embed_instruction: str = EMBED_INSTRUCTION,
+        query_instruction: str = QUERY_INSTRUCTION,
+    ):
+        self.model = model
+        self.embed_instruction = embed_instruction
+        self.query_instruction = query_instruction
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._session = requests.Session()
+        # One pooled connection per concurrent request, so none are discarded and reopened
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts with as few requests to Ollama as possible.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One embedding vector per input text.
+        """
+        if not texts:
+            return []
+
+        texts = [f"{self.embed_instruction}{text}" for text in texts]
+        batches = [list(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        if self.concurrency <= 1 or len(batches) == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        Sends one /api/embed request, backing off while the server reports it is busy.
+
+        A timeout is not retried: the server is most likely still working on the
+        batch, and resending it would only queue a duplicate.
+        """
+        for attempt in range(_MAX_RETRIES + 1):
+            response = self._session.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": texts, "keep_alive": self.keep_alive},
+                timeout=OLLAMA_REQUEST_TIMEOUT,
+            )
+            if response.status_code not in _RETRY_STATUS_CODES or attempt == _MAX_RETRIES:
+                break
+            time.sleep(0.5 * 2 ** attempt)
+
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single query text.
+
+        Args:
+            text (str): Query text to embed.
+
+        Returns:
+            list[float]: Embedding vector of the query.
+        """
+        return self._embed_batch([f"{self.query_instruction}{text}"])[0]
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache mapping a (model, text) key to its embedding vector.
+
+    Vectors are stored as EMBEDDING_CACHE_DTYPE blobs keyed by sha256(model + NUL + text),
+    where text includes the document or query instruction that was embedded with it.
+    The cache may be used from several threads; access to the connection is serialized.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, vec BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """
+        Computes the cache key of a text embedded with the given model.
+
+        Args:
+            model (str): Name of the embedding model.
+            text (str): Embedded text.
+
+        Returns:
+            bytes: SHA-256 digest identifying the (model, text) pair.
+        """
+        return hashlib.sha256(f"{model}\0{text}".encode()).digest()
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        """
+        Looks up the vectors stored under the given keys.
+
+        Args:
+            keys (list[bytes]): Cache keys to look up.
+
+        Returns:
+            dict[bytes, list[float]]: Vectors found in the cache, by key.
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), _CACHE_LOOKUP_BATCH):
+            batch = unique_keys[start:start + _CACHE_LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+            for key, vec in rows:
+                found[key] = np.frombuffer(vec, dtype=EMBEDDING_CACHE_DTYPE).astype(np.float32).tolist()
+        return found
+
+    def put_many(self, items: list[tuple[bytes, list[float]]]):
+        """
+        Stores vectors in the cache in a single transaction.
+
+        Args:
+            items (list[tuple[bytes, list[float]]]): (key, vector) pairs to store.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO cache (key, vec) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=EMBEDDING_CACHE_DTYPE).tobytes()) for key, vec in items],
+            )
+
+    @staticmethod
+    def quantize(vec: list[float]) -> list[float]:
+        """
+        Rounds a vector to the precision it has after a round-trip through the cache.
+
+        Args:
+            vec (list[float]): Vector to round.
+
+        Returns:
+            list[float]: Vector as it would be read back from the cache.
+        """
+        return np.asarray(vec, dtype=EMBEDDING_CACHE_DTYPE).astype(np.float32).tolist()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding wrapper that serves previously computed vectors from an EmbeddingCache
+    and only sends cache misses to the underlying embedding model.
+
+    Cache keys include the document or query instruction, so a query never shares
+    an entry with an identical passage.
+    """
+
+    def __init__(self, embeddings: OllamaBatchEmbeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        # Per-instance memo so repeated queries skip both Ollama and SQLite
+        self._embed_query_cached = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._embed_query_uncached)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a list of texts, reusing cached vectors where available.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One embedding vector per input text.
+        """
+        return self._embed_with_cache(texts, self.embeddings.embed_instruction, self.embeddings.embed_documents)
+
+    def _embed_with_cache(self, texts: list[str], instruction: str, embed) -> list[list[float]]:
+        """
+        Looks texts up under keys that include `instruction` and embeds the misses with `embed`.
+        """
+        keys = [EmbeddingCache.make_key(self.model, f"{instruction}{text}") for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each missing text once, even if it occurs several times in the batch
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            new_vectors = embed(list(missing.values()))
+            # Return fresh vectors at cache precision so hits and misses are identical
+            computed = [(key, EmbeddingCache.quantize(vec)) for key, vec in zip(missing.keys(), new_vectors)]
+            self.cache.put_many(computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a single query text, reusing a cached vector if available.
+
+        Repeated queries are served from an in-process LRU cache before the
+        on-disk cache is consulted.
+
+        Args:
+            text (str): Query text to embed.
+
+        Returns:
+            list[float]: Embedding vector of the query.
+        """
+        return list(self._embed_query_cached(text))
+
+    def _embed_query_uncached(self, text: str) -> tuple[float, ...]:
+        query_vector = self._embed_with_cache(
+            [text],
+            self.embeddings.query_instruction,
+            lambda texts: [self.embeddings.embed_query(query) for query in texts],
+        )[0]
+        return tuple(query_vector)
 
 def get_embedding_function():
     """
-    Initializes and returns an embedding function using the OllamaEmbeddings class.
+    Initializes and returns an embedding function backed by Ollama.
 
     This function loads a text embedding model (in this case, 'nomic-embed-text')
     which will later be used to convert text into vector representations for tasks
     like semantic search or retrieval.
 
+    Vectors are cached on disk, so texts that were already embedded are not sent
+    to Ollama again.
+
     Returns:
-        OllamaEmbeddings: An object capable of generating vector embeddings from text.
+        CachedEmbeddings: An object capable of generating vector embeddings from text.
     """
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    return embeddings
\ No newline at end of file
+    embeddings = CachedEmbeddings(
+        OllamaBatchEmbeddings(model=EMBEDDING_MODEL),
+        model=EMBEDDING_MODEL,
+        cache=EmbeddingCache(EMBEDDING_CACHE_PATH),
+    )
+    return embeddings
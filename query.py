@@ -1,12 +1,21 @@
 import argparse
-from langchain_community.vectorstores import Chroma
+import sys
 from langchain.prompts import ChatPromptTemplate
 from langchain_community.llms.ollama import Ollama
 
-from get_embedding_function import get_embedding_function
+from db_client import get_db
+from get_embedding_function import OLLAMA_KEEP_ALIVE
+from fast_search import dense_index_available, search_dense
+from usearch_index import search_usearch, usearch_enabled
 
-# Path to the persistent vector store
-CHROMA_PATH = "chroma"
+# Name of the Ollama model that generates answers
+LLM_MODEL = "mistral"
+
+# LLM client shared by all queries in this process; keep_alive keeps the model loaded between them
+LLM = Ollama(model=LLM_MODEL, keep_alive=OLLAMA_KEEP_ALIVE)
+
+# Separator placed between retrieved chunks in the prompt context
+CONTEXT_SEPARATOR = "\n\n---\n\n"
 
 # Prompt template used to generate the LLM query with context
 PROMPT_TEMPLATE = """
@@ -19,6 +28,9 @@ Answer the question based only on the following context:
 Answer the question based on the above context: {question}
 """
 
+# Prompt template parsed once per process
+PROMPT = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+
 def main():
     """
     Entry point for the CLI interface.
@@ -38,38 +50,44 @@ def query_rag(query_text: str):
         query_text (str): The user's question.
 
     Steps:
-        - Load the embedding function.
-        - Load the Chroma vector database.
-        - Search for top-k similar documents.
+        - Get the shared Chroma vector database and its embedding function.
+        - Search for top-k similar documents (usearch if RAG_VECTOR_BACKEND=usearch, a dense
+          scan for small corpora, Chroma otherwise).
         - Format the prompt using the retrieved context.
-        - Use the LLM to generate a response.
-        - Print the response along with source document IDs.
+        - Use the LLM to generate a response, printing tokens as they arrive.
+        - Print the source document IDs.
     """
-    # Load embedding model
-    embedding_function = get_embedding_function()
-    
-    # Load persistent Chroma vector store
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-
-    # Perform similarity search with top 5 results
-    results = db.similarity_search_with_score(query_text, k=5)
+    # Reuse the persistent Chroma vector store and its embedding model
+    db = get_db()
+    embedding_function = db.embeddings
+
+    # Embed the query once (memoized) and search by vector with top 5 results
+    query_embedding = embedding_function.embed_query(query_text)
+    if usearch_enabled():
+        results = search_usearch(query_embedding, k=5)
+    elif dense_index_available():
+        results = search_dense(db, query_embedding, k=5)
+    else:
+        results = db.similarity_search_by_vector_with_relevance_scores(query_embedding, k=5)
 
     # Extract the content from retrieved documents
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
+    context_text = CONTEXT_SEPARATOR.join(doc.page_content for doc, _score in results)
 
     # Format the prompt with context and question
-    prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-    prompt = prompt_template.format(context=context_text, question=query_text)
+    prompt = PROMPT.format(context=context_text, question=query_text)
 
-    # Generate the answer using the LLM
-    model = Ollama(model="mistral")
-    response_text = model.invoke(prompt)
+    # Generate the answer using the LLM, streaming tokens to stdout as they arrive
+    sys.stdout.write("Response: ")
+    response_chunks = []
+    for token in LLM.stream(prompt):
+        sys.stdout.write(token)
+        sys.stdout.flush()
+        response_chunks.append(token)
+    response_text = "".join(response_chunks)
 
     # Extract sources (document IDs) for transparency
     sources = [doc.metadata.get("id", None) for doc, _score in results]
-    formatted_response = f"Response: {response_text}\nSources: {sources}"
-    
-    print(formatted_response)
+    print(f"\nSources: {sources}")
     return response_text
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import sqlite3
+from functools import lru_cache
+import numpy as np
+from langchain.schema.document import Document
+from langchain_community.vectorstores import Chroma
+from db_client import iter_collection_pages
+
+# Environment variable selecting the retrieval backend ('chroma' or 'usearch')
+VECTOR_BACKEND_ENV = "RAG_VECTOR_BACKEND"
+
+# Directory holding the usearch index and its sidecar chunk table
+USEARCH_PATH = "usearch"
+USEARCH_INDEX_FILE = os.path.join(USEARCH_PATH, "index.usearch")
+USEARCH_CHUNKS_FILE = os.path.join(USEARCH_PATH, "chunks.sqlite3")
+
+def usearch_enabled() -> bool:
+    """
+    Returns True if the usearch backend is selected via the RAG_VECTOR_BACKEND environment variable.
+    """
+    return os.environ.get(VECTOR_BACKEND_ENV, "chroma").lower() == "usearch"
+
+def build_usearch_index(db: Chroma):
+    """
+    Rebuilds the usearch index from all embeddings stored in Chroma.
+
+    Vectors are stored in half precision with cosine distance. Chunk IDs, texts
+    and metadata are kept in a sidecar SQLite table keyed by the integer usearch key.
+
+    Args:
+        db (Chroma): Vector store to export embeddings from.
+    """
+    from usearch.index import Index
+
+    clear_usearch_index()
+    os.makedirs(USEARCH_PATH)
+
+    index = None
+    conn = sqlite3.connect(USEARCH_CHUNKS_FILE)
+    conn.execute("CREATE TABLE chunks (key INTEGER PRIMARY KEY, id TEXT, document TEXT, metadata TEXT)")
+
+    count = 0
+    for offset, page in iter_collection_pages(db, include=["embeddings", "documents", "metadatas"]):
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if index is None:
+            index = Index(ndim=vectors.shape[1], metric="cos", dtype="f16")
+
+        keys = np.arange(offset, offset + len(page["ids"]), dtype=np.uint64)
+        index.add(keys, vectors)
+        with conn:
+            conn.executemany(
+                "INSERT INTO chunks (key, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (int(key), chunk_id, document, json.dumps(metadata))
+                    for key, chunk_id, document, metadata in zip(keys, page["ids"], page["documents"], page["metadatas"])
+                ],
+            )
+        count += len(page["ids"])
+
+    conn.close()
+    if index is not None:
+        index.save(USEARCH_INDEX_FILE)
+
+    print(f"Built usearch index with {count} chunks")
+
+def search_usearch(query_embedding: list[float], k: int = 5) -> list[tuple[Document, float]]:
+    """
+    Finds the chunks closest to a query embedding in the usearch index.
+
+    Args:
+        query_embedding (list[float]): Embedded query.
+        k (int): Number of results to return.
+
+    Returns:
+        list[tuple[Document, float]]: Matching chunks with cosine similarity scores, best first.
+    """
+    index, conn = _open_usearch_index()
+    matches = index.search(np.asarray(query_embedding, dtype=np.float32), k)
+
+    results = []
+    for key, distance in zip(matches.keys, matches.distances):
+        document, metadata = conn.execute(
+            "SELECT document, metadata FROM chunks WHERE key = ?", (int(key),)
+        ).fetchone()
+        results.append((Document(page_content=document, metadata=json.loads(metadata)), 1.0 - float(distance)))
+    return results
+
+def usearch_index_available() -> bool:
+    """
+    Returns True if a usearch index has been built for the current corpus.
+    """
+    return os.path.exists(USEARCH_INDEX_FILE) and os.path.exists(USEARCH_CHUNKS_FILE)
+
+@lru_cache(maxsize=1)
+def _open_usearch_index():
+    """
+    Loads the persisted usearch index and opens its sidecar chunk table (once per process).
+    """
+    from usearch.index import Index
+
+    if not os.path.exists(USEARCH_INDEX_FILE):
+        raise FileNotFoundError(f"usearch index {USEARCH_INDEX_FILE} does not exist, run database.py first")
+
+    index = Index.restore(USEARCH_INDEX_FILE)
+    conn = sqlite3.connect(USEARCH_CHUNKS_FILE, check_same_thread=False)
+    return index, conn
+
+def clear_usearch_index():
+    """
+    Deletes the usearch index directory.
+    """
+    _open_usearch_index.cache_clear()
+
+    if os.path.exists(USEARCH_PATH):
+        shutil.rmtree(USEARCH_PATH)
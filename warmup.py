@@ -0,0 +1,24 @@
+from langchain_community.llms.ollama import Ollama
+
+from db_client import get_db
+from get_embedding_function import OLLAMA_KEEP_ALIVE
+from query import LLM_MODEL
+
+def warmup():
+    """
+    Loads the embedding and LLM models into Ollama before the first query.
+
+    The first request to each Ollama model pays a cold-load cost of several seconds.
+    Call this once at process start (e.g. from a server startup hook) to move that
+    cost out of the query path. It also opens the shared Chroma client.
+    """
+    db = get_db()
+
+    # Bypass the embedding cache so the request actually reaches Ollama
+    db.embeddings.embeddings.embed_query(".")
+
+    # Generate a single token to load the LLM weights
+    Ollama(model=LLM_MODEL, num_predict=1, keep_alive=OLLAMA_KEEP_ALIVE).invoke(".")
+
+if __name__ == "__main__":
+    warmup()